@@ -1,9 +1,12 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Boolean
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, Session
 from pydantic import BaseModel, ConfigDict, constr
-from typing import List, Optional
+from typing import Annotated, List, Optional
+from . import profiling
 
 DATABASE_URL = "sqlite:///./library.db"
 
@@ -12,6 +15,12 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 app = FastAPI()
+app.include_router(profiling.router, include_in_schema=False)
+# Compress responses over minimum_size for clients that send Accept-Encoding: gzip.
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+if profiling.PROFILING_ENABLED:
+    app.router.route_class = profiling.ProfiledRoute
+    profiling.install_signal_handler()
 
 class User(Base):
     __tablename__ = "users"
@@ -61,8 +70,34 @@ class UserOut(BaseModel):
     name: str
     model_config = ConfigDict(from_attributes=True)
 
-@app.get("/books", response_model=List[BookOut])
-def list_books(db: Session = Depends(get_db)):
+def select_fields(db: Session, model, schema, fields: str):
+    # Sparse fieldsets: select only the requested columns and skip ORM/Pydantic hydration.
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    if not names:
+        raise HTTPException(status_code=400, detail="No fields requested")
+    unknown = [name for name in names if name not in schema.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    rows = db.query(*[getattr(model, name) for name in names]).all()
+    return JSONResponse([dict(row._mapping) for row in rows])
+
+FieldsQuery = Annotated[Optional[str], Query(
+    description="Comma-separated sparse fieldset, e.g. `id,title`. When set, each item contains "
+    "only the requested fields instead of the full schema; unknown fields return 400."
+)]
+
+SPARSE_RESPONSE = {
+    200: {
+        "description": "Successful Response. With `fields`, each item is a partial object "
+        "containing only the requested fields."
+    },
+    400: {"description": "Unknown or empty `fields`"},
+}
+
+@app.get("/books", response_model=List[BookOut], responses=SPARSE_RESPONSE)
+def list_books(fields: FieldsQuery = None, db: Session = Depends(get_db)):
+    if fields is not None:
+        return select_fields(db, Book, BookOut, fields)
     return db.query(Book).all()
 
 @app.post("/books", response_model=BookOut)
@@ -95,8 +130,10 @@ def delete_book(book_id: int, db: Session = Depends(get_db)):
     db.commit()
     return {"detail": "Book deleted"}
 
-@app.get("/users", response_model=List[UserOut])
-def list_users(db: Session = Depends(get_db)):
+@app.get("/users", response_model=List[UserOut], responses=SPARSE_RESPONSE)
+def list_users(fields: FieldsQuery = None, db: Session = Depends(get_db)):
+    if fields is not None:
+        return select_fields(db, User, UserOut, fields)
     return db.query(User).all()
 
 @app.post("/users", response_model=UserOut)
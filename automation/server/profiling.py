@@ -0,0 +1,261 @@
+import cProfile
+import functools
+import inspect
+import logging
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Deque, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+def _slow_request_ms_from_env() -> float:
+    value = os.getenv("PROFILE_SLOW_REQUEST_MS", "0")
+    try:
+        threshold = float(value)
+    except ValueError:
+        threshold = -1
+    if threshold < 0:
+        logger.warning("Ignoring invalid PROFILE_SLOW_REQUEST_MS=%r, slow request profiling disabled", value)
+        return 0.0
+    return threshold
+
+
+# Profiling is opt-in: the admin endpoints, signal handler and per-request capture
+# are all inactive unless PROFILING_ENABLED=1.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+# Requests slower than this (in ms) get their cProfile stats dumped; 0 disables.
+SLOW_REQUEST_MS = _slow_request_ms_from_env()
+DEFAULT_SAMPLE_INTERVAL_MS = 5.0
+# Faster sampling walks every thread's stack often enough to hog the GIL.
+MIN_SAMPLE_INTERVAL_MS = 1.0
+# Caps disk usage when the slow request threshold is set very low.
+MAX_REQUEST_DUMPS_PER_MINUTE = 10
+
+
+def _dump_path(prefix: str, suffix: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(PROFILE_DIR, f"{prefix}-{stamp}-{time.monotonic_ns()}{suffix}")
+
+
+def _fold_stack(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Wall-clock sampler over all threads, dumped as folded stacks
+    (flamegraph.pl / speedscope / inferno input). No thread runs while stopped."""
+
+    def __init__(self):
+        self.interval_ms = DEFAULT_SAMPLE_INTERVAL_MS
+        self.samples = 0
+        self._stacks = Counter()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, interval_ms: float = DEFAULT_SAMPLE_INTERVAL_MS) -> bool:
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self.interval_ms = interval_ms
+            self.samples = 0
+            self._stacks.clear()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> Optional[str]:
+        with self._lock:
+            if self._thread is None:
+                return None
+            self._stop_event.set()
+            try:
+                self._thread.join()
+                path = _dump_path("sampler", ".folded")
+                with open(path, "w") as f:
+                    for stack, count in self._stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+            finally:
+                self._thread = None
+            return path
+
+    def toggle(self) -> Optional[str]:
+        if self.running:
+            return self.stop()
+        self.start()
+        return None
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        interval = self.interval_ms / 1000
+        while not self._stop_event.wait(interval):
+            for ident, frame in sys._current_frames().items():
+                if ident != own_ident:
+                    self._stacks[_fold_stack(frame)] += 1
+            self.samples += 1
+
+
+sampler = SamplingProfiler()
+
+
+def install_signal_handler(signum: Optional[int] = getattr(signal, "SIGUSR2", None)) -> bool:
+    # Signals can only be installed from the main thread and SIGUSR2 does not exist on Windows.
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+    # The main thread runs the event loop, so the join and dump in stop() happen on a worker thread.
+    signal.signal(signum, lambda *_: threading.Thread(target=sampler.toggle, daemon=True).start())
+    return True
+
+
+# Per-request cProfile capture. Only the endpoint call is profiled, in the threadpool
+# thread that runs it: the event loop is shared with every other request, and since
+# Python 3.12 cProfile can only be enabled once per interpreter.
+_request_profiles: ContextVar[Optional[List[cProfile.Profile]]] = ContextVar("_request_profiles", default=None)
+_request_lock = threading.Lock()
+# Monotonic times of recent dumps, only touched from the event loop.
+_request_dump_times: Deque[float] = deque()
+
+
+def _dump_budget_left() -> bool:
+    now = time.monotonic()
+    while _request_dump_times and now - _request_dump_times[0] >= 60:
+        _request_dump_times.popleft()
+    return len(_request_dump_times) < MAX_REQUEST_DUMPS_PER_MINUTE
+
+
+def _profiled_endpoint(endpoint):
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profiles = _request_profiles.get()
+        if profiles is None:
+            return endpoint(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active; on 3.12+ cProfile is interpreter-wide.
+            return endpoint(*args, **kwargs)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profile.disable()
+            profiles.append(profile)
+    return wrapper
+
+
+def dump_request_profile(method: str, path: str, elapsed_ms: float, profiles: List[cProfile.Profile]) -> str:
+    name = path.strip("/").replace("/", "_") or "root"
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+        stats.add(profile)
+    out = _dump_path(f"request-{method}-{name}-{int(elapsed_ms)}ms", ".prof")
+    stats.dump_stats(out)
+    return out
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute that cProfiles sync endpoints when slow-request capture is on.
+    Only one request is profiled at a time; the rest pass straight through."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = _profiled_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def profiled_handler(request):
+            if not (PROFILING_ENABLED and SLOW_REQUEST_MS) or not _dump_budget_left():
+                return await handler(request)
+            if not _request_lock.acquire(blocking=False):
+                return await handler(request)
+            profiles = []
+            token = _request_profiles.set(profiles)
+            start = time.perf_counter()
+            try:
+                response = await handler(request)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                _request_profiles.reset(token)
+                _request_lock.release()
+            if profiles and elapsed_ms >= SLOW_REQUEST_MS:
+                # A failed dump must never turn the observed request into an error.
+                _request_dump_times.append(time.monotonic())
+                try:
+                    await run_in_threadpool(
+                        dump_request_profile, request.method, request.url.path, elapsed_ms, profiles
+                    )
+                except Exception:
+                    logger.exception("Failed to dump profile for %s %s", request.method, request.url.path)
+            return response
+
+        return profiled_handler
+
+
+def require_profiling_enabled():
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+
+
+router = APIRouter(prefix="/admin/profiling", dependencies=[Depends(require_profiling_enabled)])
+
+
+@router.get("")
+def profiling_status():
+    return {
+        "sampler_running": sampler.running,
+        "sample_interval_ms": sampler.interval_ms,
+        "samples": sampler.samples,
+        "slow_request_ms": SLOW_REQUEST_MS,
+        "profile_dir": os.path.abspath(PROFILE_DIR),
+    }
+
+
+@router.post("/sampler/start")
+def start_sampler(interval_ms: float = DEFAULT_SAMPLE_INTERVAL_MS):
+    if interval_ms < MIN_SAMPLE_INTERVAL_MS:
+        raise HTTPException(status_code=400, detail=f"interval_ms must be at least {MIN_SAMPLE_INTERVAL_MS:g}")
+    if not sampler.start(interval_ms):
+        raise HTTPException(status_code=400, detail="Sampler already running")
+    return {"detail": "Sampler started"}
+
+
+@router.post("/sampler/stop")
+def stop_sampler():
+    path = sampler.stop()
+    if path is None:
+        raise HTTPException(status_code=400, detail="Sampler is not running")
+    return {"detail": "Sampler stopped", "path": path}
+
+
+@router.put("/slow-requests")
+def set_slow_request_threshold(threshold_ms: float):
+    global SLOW_REQUEST_MS
+    if threshold_ms < 0:
+        raise HTTPException(status_code=400, detail="threshold_ms must not be negative")
+    SLOW_REQUEST_MS = threshold_ms
+    return {"detail": "Slow request threshold updated", "slow_request_ms": SLOW_REQUEST_MS}
@@ -69,4 +69,20 @@ async def test_endpoint_methods():
     # /books/{book_id}/borrow supports POST
     assert set(paths["/books/{book_id}/borrow"].keys()) == {"post"}
     # /books/{book_id}/return supports POST
-    assert set(paths["/books/{book_id}/return"].keys()) == {"post"} 
\ No newline at end of file
+    assert set(paths["/books/{book_id}/return"].keys()) == {"post"}
+
+@pytest.mark.asyncio
+async def test_list_endpoints_fields_parameter():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.get("/openapi.json")
+    assert response.status_code == 200
+    paths = response.json()["paths"]
+    for path in ("/books", "/users"):
+        params = {p["name"]: p for p in paths[path]["get"].get("parameters", [])}
+        assert "fields" in params
+        assert params["fields"]["in"] == "query"
+        assert not params["fields"].get("required", False)
+        assert "only the requested fields" in params["fields"]["description"]
+        assert "partial object" in paths[path]["get"]["responses"]["200"]["description"]
+
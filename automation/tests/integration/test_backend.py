@@ -6,7 +6,14 @@ from uuid import uuid4
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from automation.server.backend import Base
+from automation.server import backend, profiling
+from collections import deque
 import asyncio
+import importlib
+import os
+import pstats
+import signal
+import time
 
 DATABASE_URL = "sqlite:///./library.db"
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
@@ -138,4 +145,177 @@ async def test_borrow_and_return_book(client, unique_name):
     response = await client.post(f"/books/{book_id}/return")
     assert response.status_code == 200
     response = await client.post(f"/books/{book_id}/return")
-    assert response.status_code == 400 
\ No newline at end of file
+    assert response.status_code == 400
+
+@pytest.fixture
+def profiling_enabled(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "SLOW_REQUEST_MS", 0.0)
+    monkeypatch.setattr(profiling, "_request_dump_times", deque())
+    yield tmp_path
+    profiling.sampler.stop()
+
+@pytest.fixture
+def profiled_backend(monkeypatch):
+    # Re-import backend with profiling on so its PROFILING_ENABLED wiring is what gets tested
+    previous = signal.getsignal(signal.SIGUSR2) if hasattr(signal, "SIGUSR2") else None
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    yield importlib.reload(backend)
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", False)
+    importlib.reload(backend)
+    if previous is not None:
+        signal.signal(signal.SIGUSR2, previous)
+
+@pytest_asyncio.fixture
+async def profiled_client(profiled_backend):
+    transport = ASGITransport(app=profiled_backend.app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+@pytest.mark.asyncio
+async def test_profiling_disabled_by_default(client):
+    response = await client.get("/admin/profiling")
+    assert response.status_code == 404
+    assert all(type(route) is not profiling.ProfiledRoute for route in app.routes)
+
+def test_profiling_enabled_wiring(profiled_backend):
+    routes = [route for route in profiled_backend.app.routes if getattr(route, "path", None) in ("/books", "/users")]
+    assert routes
+    assert all(type(route) is profiling.ProfiledRoute for route in routes)
+    if hasattr(signal, "SIGUSR2"):
+        assert signal.getsignal(signal.SIGUSR2) not in (signal.SIG_DFL, signal.SIG_IGN, None)
+
+@pytest.mark.asyncio
+async def test_profiling_slow_request_needs_profiling_enabled(profiled_client, monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", False)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "SLOW_REQUEST_MS", 0.001)
+    response = await profiled_client.get("/books")
+    assert response.status_code == 200
+    assert not list(tmp_path.iterdir())
+
+@pytest.mark.asyncio
+async def test_profiling_sampler_start_stop(client, profiling_enabled):
+    response = await client.post("/admin/profiling/sampler/start", params={"interval_ms": 1})
+    assert response.status_code == 200
+    response = await client.post("/admin/profiling/sampler/start")
+    assert response.status_code == 400
+    await client.get("/books")
+    await asyncio.sleep(0.05)
+    response = await client.post("/admin/profiling/sampler/stop")
+    assert response.status_code == 200
+    with open(response.json()["path"]) as f:
+        lines = f.read().splitlines()
+    assert lines
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    response = await client.post("/admin/profiling/sampler/stop")
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_profiling_sampler_min_interval(client, profiling_enabled):
+    response = await client.post("/admin/profiling/sampler/start", params={"interval_ms": 0.00001})
+    assert response.status_code == 400
+    assert not profiling.sampler.running
+
+def test_profiling_sampler_failed_dump_resets_state(profiling_enabled, monkeypatch):
+    (profiling_enabled / "file").write_text("")
+    assert profiling.sampler.start(profiling.MIN_SAMPLE_INTERVAL_MS)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(profiling_enabled / "file" / "profiles"))
+    with pytest.raises(OSError):
+        profiling.sampler.stop()
+    assert not profiling.sampler.running
+
+@pytest.mark.asyncio
+async def test_profiling_slow_request_dump(profiled_client, profiling_enabled):
+    response = await profiled_client.put("/admin/profiling/slow-requests", params={"threshold_ms": 0.001})
+    assert response.status_code == 200
+    await profiled_client.post("/books", json={"title": "Profiled", "author": "Author"})
+    response = await profiled_client.get("/books")
+    assert response.status_code == 200
+    assert response.json()[0]["title"] == "Profiled"
+    dumps = list(profiling_enabled.glob("request-GET-books-*.prof"))
+    assert len(dumps) == 1
+    stats = pstats.Stats(str(dumps[0]))
+    assert any(func[2] == "list_books" for func in stats.stats)
+
+@pytest.mark.asyncio
+async def test_profiling_negative_threshold(client, profiling_enabled):
+    response = await client.put("/admin/profiling/slow-requests", params={"threshold_ms": -1})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_list_books_fields(client):
+    await client.post("/books", json={"title": "Sparse", "author": "Author"})
+    response = await client.get("/books", params={"fields": "id,title"})
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 1
+    assert set(data[0].keys()) == {"id", "title"}
+    assert data[0]["title"] == "Sparse"
+
+@pytest.mark.asyncio
+async def test_list_books_unknown_field(client):
+    response = await client.get("/books", params={"fields": "id,isbn"})
+    assert response.status_code == 400
+    response = await client.get("/books", params={"fields": " , "})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_list_users_fields(client, unique_name):
+    await client.post("/users", json={"name": unique_name})
+    response = await client.get("/users", params={"fields": "name"})
+    assert response.status_code == 200
+    assert response.json() == [{"name": unique_name}]
+    response = await client.get("/users", params={"fields": "books"})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_list_books_gzip(client):
+    for i in range(30):
+        await client.post("/books", json={"title": f"Book {i}", "author": "Author"})
+    response = await client.get("/books", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 30
+    response = await client.get("/books", params={"fields": "id"}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR2"), reason="SIGUSR2 is not available on this platform")
+def test_profiling_signal_toggles_sampler(profiling_enabled):
+    previous = signal.getsignal(signal.SIGUSR2)
+    try:
+        assert profiling.install_signal_handler()
+        os.kill(os.getpid(), signal.SIGUSR2)
+        deadline = time.monotonic() + 2
+        while not profiling.sampler.running and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert profiling.sampler.running
+        os.kill(os.getpid(), signal.SIGUSR2)
+        while profiling.sampler.running and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not profiling.sampler.running
+        assert list(profiling_enabled.glob("sampler-*.folded"))
+    finally:
+        signal.signal(signal.SIGUSR2, previous)
+
+@pytest.mark.asyncio
+async def test_profiling_failed_dump_keeps_response(profiled_client, profiling_enabled, monkeypatch):
+    (profiling_enabled / "file").write_text("")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(profiling_enabled / "file" / "profiles"))
+    monkeypatch.setattr(profiling, "SLOW_REQUEST_MS", 0.001)
+    response = await profiled_client.post("/books", json={"title": "Kept", "author": "Author"})
+    assert response.status_code == 200
+    response = await profiled_client.get("/books")
+    assert response.status_code == 200
+    assert response.json()[0]["title"] == "Kept"
+
+@pytest.mark.asyncio
+async def test_profiling_request_dumps_rate_limited(profiled_client, profiling_enabled, monkeypatch):
+    monkeypatch.setattr(profiling, "SLOW_REQUEST_MS", 0.001)
+    monkeypatch.setattr(profiling, "MAX_REQUEST_DUMPS_PER_MINUTE", 2)
+    for _ in range(4):
+        response = await profiled_client.get("/books")
+        assert response.status_code == 200
+    assert len(list(profiling_enabled.glob("request-GET-books-*.prof"))) == 2
+
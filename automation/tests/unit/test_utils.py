@@ -1,6 +1,8 @@
 import pytest
 from automation.server.backend import BookCreate, BookUpdate, UserCreate, Book, User
+from automation.server.profiling import _fold_stack, _slow_request_ms_from_env
 from pydantic import ValidationError
+import sys
 
 def test_book_create_valid():
     book = BookCreate(title="Test Title", author="Test Author")
@@ -57,4 +59,21 @@ def test_user_book_relationship():
     user.books = [book]
     book.borrower = user
     assert book.borrower.name == "U"
-    assert user.books[0].title == "T" 
\ No newline at end of file
+    assert user.books[0].title == "T"
+
+def test_fold_stack_root_first():
+    def inner():
+        return _fold_stack(sys._getframe())
+    folded = inner()
+    frames = folded.split(";")
+    assert frames[-1].startswith("inner (test_utils.py:")
+    assert frames[-2].startswith("test_fold_stack_root_first (test_utils.py:")
+
+def test_slow_request_ms_from_env(monkeypatch):
+    monkeypatch.setenv("PROFILE_SLOW_REQUEST_MS", "250")
+    assert _slow_request_ms_from_env() == 250.0
+    monkeypatch.setenv("PROFILE_SLOW_REQUEST_MS", "fast")
+    assert _slow_request_ms_from_env() == 0.0
+    monkeypatch.setenv("PROFILE_SLOW_REQUEST_MS", "-5")
+    assert _slow_request_ms_from_env() == 0.0
+